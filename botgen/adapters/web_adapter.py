@@ -1,5 +1,10 @@
+import asyncio
 import dataclasses
+import time
+import uuid
+from collections import OrderedDict
 from datetime import datetime
+from datetime import timezone
 from typing import Awaitable
 from typing import Callable
 
@@ -14,24 +19,76 @@ from loguru import logger
 
 from botgen.core import BotMessage
 
+_BOT_MESSAGE_FIELDS = tuple(field.name for field in dataclasses.fields(BotMessage))
+
+_TIMESTAMP_RESOLUTION_NS = 1_000_000
+_cached_timestamp = [0, None]
+
+
+def _utcnow() -> datetime:
+    """ Current UTC time, reused for activities arriving within the same millisecond """
+    now_ns = time.monotonic_ns()
+
+    if _cached_timestamp[1] is None or now_ns - _cached_timestamp[0] >= _TIMESTAMP_RESOLUTION_NS:
+        _cached_timestamp[0] = now_ns
+        _cached_timestamp[1] = datetime.now(tz=timezone.utc)
+
+    return _cached_timestamp[1]
+
+
+def _message_to_dict(message: BotMessage) -> dict:
+    """ Shallow field projection of a flat BotMessage, avoiding dataclasses.asdict deep copies """
+    return {name: getattr(message, name) for name in _BOT_MESSAGE_FIELDS}
+
+
+def _consume_exception(task: asyncio.Task) -> None:
+    """ Failures are logged by the deferred pipeline, keep asyncio from reporting them again """
+    if not task.cancelled():
+        task.exception()
+
 
 class WebAdapter(BotAdapter):
     """ Connects PyBot to websocket or webhook """
 
-    def __init__(self, on_turn_error: Callable[[TurnContext, Exception], Awaitable] = None):
+    def __init__(
+        self,
+        on_turn_error: Callable[[TurnContext, Exception], Awaitable] = None,
+        defer_processing: bool = False,
+        deferred_ttl: float = 300,
+        max_deferred: int = 1000,
+    ):
+        """
+        Args:
+            on_turn_error (Callable): handler called when the bot logic raises
+            defer_processing (bool): acknowledge webhook requests immediately and run the bot logic
+                in the background. Replies are then fetched with `get_deferred_response`, exposed by
+                `Bot` as `GET {webhook_uri}/{token}`
+            deferred_ttl (float): seconds the outcome of a deferred turn is kept for polling. Turns
+                still running past it are left to finish, but can no longer be polled
+            max_deferred (int): maximum number of deferred turns kept at once. Once reached with
+                every turn still running, new requests are processed inline
+        """
         super().__init__(on_turn_error)
+        self.defer_processing = defer_processing
+        self.deferred_ttl = deferred_ttl
+        self.max_deferred = max_deferred
+
+        self._deferred: OrderedDict[str, tuple[float, asyncio.Task]] = OrderedDict()
+        # Strong references to running deferred turns, which asyncio only holds weakly
+        self._running_deferred: set[asyncio.Task] = set()
 
     def activity_to_message(self, activity: Activity) -> BotMessage:
         """ Caste a message to the simple format used by the websocket client """
-        message = BotMessage(
-            type=activity.type,
-            text=activity.text,
-        )
+        channel_data = activity.channel_data
 
-        if activity.channel_data:
-            message.__dict__ = activity.channel_data.__dict__
+        if not channel_data:
+            return BotMessage(type=activity.type, text=activity.text)
 
-        return message
+        defaults = {"type": activity.type, "text": activity.text}
+
+        return BotMessage(
+            **{name: getattr(channel_data, name, defaults.get(name)) for name in _BOT_MESSAGE_FIELDS}
+        )
 
     async def send_activities(
         self, context: TurnContext, activities: list[Activity]
@@ -40,21 +97,21 @@ class WebAdapter(BotAdapter):
 
         responses = list()
 
-        for i in range(len(activities)):
-            activity = activities[i]
-            message = self.activity_to_message(activity=activity)
-            channel = context.activity.channel_id
+        if not activities:
+            return responses
+
+        channel = context.activity.channel_id
 
-            if channel == "websocket":
-                raise NotImplementedError("Web socket not implemented")
-            elif channel == "webhook":
-                outbound = context.turn_state.get("httpBody")
+        if channel == "websocket":
+            raise NotImplementedError("Web socket not implemented")
 
-                if not outbound:
-                    outbound = []
+        if channel != "webhook":
+            return responses
 
-                outbound.append(dataclasses.asdict(message))
-                context.turn_state["httpBody"] = outbound
+        outbound = context.turn_state.setdefault("httpBody", [])
+        outbound.extend(
+            _message_to_dict(self.activity_to_message(activity=activity)) for activity in activities
+        )
 
         return responses
 
@@ -69,12 +126,13 @@ class WebAdapter(BotAdapter):
     async def process_activity(self, request: Request, logic: callable):
         body = await request.json()
         message = BotMessage(**body)
+        user = message.user
 
         activity = Activity(
-            timestamp=datetime.now(),
+            timestamp=_utcnow(),
             channel_id="webhook",
-            conversation={"id": message.user},
-            from_property={"id": message.user},
+            conversation={"id": user},
+            from_property={"id": user},
             recipient={"id": "bot"},
             channel_data=message,
             text=message.text,
@@ -85,6 +143,84 @@ class WebAdapter(BotAdapter):
 
         context.turn_state["httpStatus"] = 200
 
+        if self.defer_processing:
+            if self._evict_deferred():
+                return self._defer_pipeline(context=context, logic=logic)
+
+            # Every kept turn is still running, answer inline rather than dropping one of them
+            await self.run_pipeline(context=context, callback=logic)
+
+            return {"status": "done", "body": context.turn_state.get("httpBody")}
+
         await self.run_pipeline(context=context, callback=logic)
 
         return context.turn_state.get("httpBody")
+
+    def get_deferred_response(self, token: str) -> dict:
+        """ Poll the outcome of a turn started with `defer_processing` enabled """
+        deferred = self._deferred.get(token)
+
+        if deferred is None:
+            return {"status": "unknown", "token": token}
+
+        _, task = deferred
+
+        if not task.done():
+            return {"status": "pending", "token": token}
+
+        del self._deferred[token]
+
+        if task.cancelled() or task.exception() is not None:
+            return {"status": "error", "token": token}
+
+        return {"status": "done", "token": token, "body": task.result()}
+
+    def _defer_pipeline(self, context: TurnContext, logic: callable) -> dict:
+        """ Schedule the bot logic as a background task and acknowledge the request right away """
+        token = str(uuid.uuid4())
+        task = asyncio.create_task(self._run_deferred_pipeline(context=context, logic=logic))
+        task.add_done_callback(_consume_exception)
+        self._running_deferred.add(task)
+        task.add_done_callback(self._running_deferred.discard)
+        self._deferred[token] = (time.monotonic(), task)
+
+        return {"status": "accepted", "token": token}
+
+    async def _run_deferred_pipeline(self, context: TurnContext, logic: callable):
+        """ Run the bot logic for a deferred turn, logging failures before re-raising them """
+        try:
+            await self.run_pipeline(context=context, callback=logic)
+        except Exception:
+            logger.exception("Deferred turn failed")
+            raise
+
+        return context.turn_state.get("httpBody")
+
+    def _evict_deferred(self) -> bool:
+        """
+        Drop expired deferred turns, then finished ones while `max_deferred` is reached.
+        Returns whether there is room left for another deferred turn
+        """
+        expired_before = time.monotonic() - self.deferred_ttl
+
+        while self._deferred:
+            token, (created_at, _) = next(iter(self._deferred.items()))
+
+            if created_at >= expired_before:
+                break
+
+            del self._deferred[token]
+
+        if len(self._deferred) < self.max_deferred:
+            return True
+
+        for token, (_, task) in list(self._deferred.items()):
+            if not task.done():
+                continue
+
+            del self._deferred[token]
+
+            if len(self._deferred) < self.max_deferred:
+                return True
+
+        return False
@@ -1,10 +1,14 @@
 from __future__ import annotations
 
+import dataclasses
+
 from botbuilder.core import TurnContext
 from botbuilder.schema import Activity
 
 import botgen
 
+_ACTIVITY_FIELDS = frozenset(Activity._attribute_map)
+
 
 class BotWorker:
     """
@@ -12,6 +16,8 @@ class BotWorker:
     Note that adapters are likely to extend this class with additional platform-specific methods - refer to the adapter documentation for these extensions.
     """
 
+    __slots__ = ("_controller", "_config")
+
     def __init__(self, controller: botgen.Bot, config: dict) -> None:
         self._controller = controller
         self._config = config
@@ -26,7 +32,7 @@ class BotWorker:
 
     async def say(self, message: botgen.BotMessage | Activity | str):
         """ Send a message using whatever context the `bot` was spawned """
-        activity = await self.ensure_message_format(message=message)
+        activity = self.ensure_message_format(message=message)
 
         return await self._config["context"].send_activity(activity)
 
@@ -36,15 +42,17 @@ class BotWorker:
         Message will be sent using the context of the source message,
         which may in some cases be different than the context used to spawn the bot
         """
-        activity = await self.ensure_message_format(message=message_resp)
+        activity = self.ensure_message_format(message=message_resp)
 
-        reference = TurnContext.get_conversation_reference(message_src.incoming_message)
+        reference = message_src.reference or TurnContext.get_conversation_reference(
+            message_src.incoming_message
+        )
 
         activity = TurnContext.apply_conversation_reference(activity, reference)
 
         return await self.say(activity)
 
-    async def ensure_message_format(self, message: botgen.BotMessage | str) -> Activity:
+    def ensure_message_format(self, message: botgen.BotMessage | str) -> Activity:
         """ 
         Take a crudely-formed Bot message with any sort of field (may just be a string, may be a partial message object)
         and map it into a beautiful BotFramework Activity
@@ -52,4 +60,9 @@ class BotWorker:
         if isinstance(message, str):
             return Activity(type="message", text=message, channel_data={})
 
-        return Activity(**message.__dict__)
+        if dataclasses.is_dataclass(message):
+            fields = {f.name: getattr(message, f.name) for f in dataclasses.fields(message)}
+        else:
+            fields = message.__dict__
+
+        return Activity(**{k: v for k, v in fields.items() if k in _ACTIVITY_FIELDS})
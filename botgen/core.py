@@ -1,7 +1,13 @@
+from __future__ import annotations
+
+import inspect
+import re
+import sys
 from abc import ABC
 from dataclasses import dataclass
+from dataclasses import field
+from types import MappingProxyType
 from typing import Callable
-from typing import Optional
 
 from aiohttp import web
 from botbuilder.core import BotAdapter
@@ -20,31 +26,74 @@ from loguru import logger
 from botgen.bot_worker import BotWorker
 from botgen.conversation_state import BotConversationState
 
+_NO_EXACT_TRIGGERS = MappingProxyType({})
+
 
-@dataclass
+@dataclass(slots=True)
 class BotMessage:
-    type: Optional[str] = None
-    text: Optional[str] = None
-    value: Optional[str] = None
-    user: Optional[str] = None
-    channel: Optional[str] = None
-    reference: Optional[ConversationReference] = None
-    incoming_message: Optional[Activity] = None
+    type: str | None = None
+    text: str | None = None
+    value: str | None = None
+    user: str | None = None
+    channel: str | None = None
+    reference: ConversationReference | None = None
+    incoming_message: Activity | None = None
 
 
 class BotPlugin(ABC):
+    __slots__ = ("name", "middlewares")
+
     name: str
     middlewares: dict
 
 
-@dataclass
+def _build_trigger_matcher(
+    pattern: str | re.Pattern | list | Callable, trigger_type: str = None
+) -> Callable | None:
+    """Classify a trigger pattern once. Exact text patterns get no matcher, Bot.hears indexes them"""
+    if trigger_type == "regexp" or isinstance(pattern, re.Pattern):
+        patterns = pattern if isinstance(pattern, list) else [pattern]
+        expressions = tuple(re.compile(expression) for expression in patterns)
+        return lambda message: isinstance(message.text, str) and any(
+            expression.search(message.text) for expression in expressions
+        )
+
+    if isinstance(pattern, list):
+        if any(isinstance(item, re.Pattern) for item in pattern):
+            # Compiled expressions are searched, any other item must equal the text
+            expressions = tuple(item for item in pattern if isinstance(item, re.Pattern))
+            texts = [item for item in pattern if not isinstance(item, re.Pattern)]
+            return lambda message: message.text in texts or (
+                isinstance(message.text, str)
+                and any(expression.search(message.text) for expression in expressions)
+            )
+
+        if not all(isinstance(text, str) for text in pattern):
+            return lambda message: message.text in pattern
+
+        return None
+
+    if isinstance(pattern, str):
+        return None
+
+    if isinstance(pattern, Callable):
+        return pattern
+
+    return lambda message: False
+
+
+@dataclass(slots=True)
 class BotTrigger:
     type: str
-    pattern: str | BotMessage
+    pattern: str | re.Pattern | list | Callable
     handler: Callable
+    matcher: Callable | None = field(init=False, repr=False, compare=False)
 
+    def __post_init__(self):
+        self.matcher = _build_trigger_matcher(self.pattern, self.type)
 
-@dataclass
+
+@dataclass(slots=True)
 class Middleware:
     spawn: Callable
     ingest: Callable
@@ -93,7 +142,10 @@ class Bot:
         self.url_encoded_limit = url_encoded_limit
 
         self._events: dict[list] = {}
-        self._triggers: dict[list[BotTrigger]] = {}
+        # Registration order shared by both trigger indexes, so earlier triggers take precedence
+        self._trigger_count = 0
+        self._exact_triggers: dict[dict[str, tuple[int, BotTrigger]]] = {}
+        self._pattern_triggers: dict[list[tuple[int, BotTrigger]]] = {}
         self._interrupts: dict[list[BotTrigger]] = {}
         self._dependencies: dict = {}
         self._boot_complete_handlers: list[Callable] = []
@@ -119,28 +171,42 @@ class Bot:
 
         return web.json_response(body)
 
+    async def process_deferred_response(self, request: web.Request):
+        """ """
+        body = self.adapter.get_deferred_response(request.match_info["token"])
+
+        return web.json_response(body)
+
     def configure_webhook(self):
         """ """
-        self.webserver.add_routes([web.post(self.webhook_uri, self.process_incoming_message)])
+        routes = [web.post(self.webhook_uri, self.process_incoming_message)]
+
+        if getattr(self.adapter, "defer_processing", False):
+            routes.append(web.get(f"{self.webhook_uri}/{{token}}", self.process_deferred_response))
+
+        self.webserver.add_routes(routes)
 
     async def handle_turn(self, turn_context: TurnContext):
         """ """
 
+        activity = turn_context.activity
+        reference = TurnContext.get_conversation_reference(activity)
+
         message = BotMessage(
-            type=turn_context.activity.type,
-            user=turn_context.activity.from_property["id"],
-            text=turn_context.activity.text,
-            channel=turn_context.activity.conversation["id"],
-            value=turn_context.activity.value,
-            reference=TurnContext.get_conversation_reference(turn_context.activity),
-            incoming_message=turn_context.activity,
+            type=activity.type,
+            user=activity.from_property["id"],
+            text=activity.text,
+            channel=activity.conversation["id"],
+            value=activity.value,
+            reference=reference,
+            incoming_message=activity,
         )
 
         turn_context.turn_state["BotMessage"] = message
 
         dialog_context = await self.dialog_set.create_context(turn_context=turn_context)
 
-        bot_worker = await self.spawn(dialog_context)
+        bot_worker = await self.spawn(dialog_context, reference=reference)
 
         await self._process_trigger_and_events(bot_worker=bot_worker, message=message)
 
@@ -157,42 +223,46 @@ class Bot:
 
     async def trigger(self, event: str, bot_worker: BotWorker, message: BotMessage):
         """ """
-        if event in self._events:
-            for ev in self._events[event]:
-                handler_result = await ev(bot_worker, message)
+        for ev in self._events.get(event, ()):
+            handler_result = await ev(bot_worker, message)
 
-                if handler_result:
-                    break
+            if handler_result:
+                break
 
     async def _listen_for_triggers(self, bot_worker: BotWorker, message: BotMessage):
         """ """
-        if message.type in self._triggers:
-            triggers: list[Callable] = self._triggers[message.type]
+        message_type = message.type
+        exact_match = None
 
-            for trigger in triggers:
-                test_results = await self._test_trigger(trigger=trigger, message=message)
+        # Webhook payloads may carry any JSON value as text, only strings are indexed
+        if isinstance(message.text, str):
+            exact_triggers = self._exact_triggers.get(message_type, _NO_EXACT_TRIGGERS)
+            exact_match = exact_triggers.get(message.text)
 
-                if test_results:
-                    trigger_results = await trigger.handler(bot_worker, message)
-                    return trigger_results
+        exact_position = exact_match[0] if exact_match else sys.maxsize
 
-        return False
+        # Non-exact triggers registered before the exact match still take precedence
+        for position, trigger in self._pattern_triggers.get(message_type, ()):
+            if position > exact_position:
+                break
 
-    async def _test_trigger(self, trigger: BotTrigger, message: BotMessage):
-        """ """
+            # Only asynchronous patterns go through the event loop
+            test_results = trigger.matcher(message)
 
-        if isinstance(trigger.pattern, str):
-            return True if message.text == trigger.pattern else False
+            if inspect.isawaitable(test_results):
+                test_results = await test_results
 
-        if isinstance(trigger.pattern, list):
-            return True if message.text in trigger.pattern else False
+            if test_results:
+                trigger_results = await trigger.handler(bot_worker, message)
+                return trigger_results
 
-        if isinstance(trigger.pattern, Callable):
-            return await trigger.pattern(message)
+        if exact_match:
+            _, trigger = exact_match
+            return await trigger.handler(bot_worker, message)
 
         return False
 
-    async def ready(self, handler: Callable) -> None:
+    def ready(self, handler: Callable) -> None:
         """ """
 
         if self.booted:
@@ -200,22 +270,45 @@ class Bot:
         else:
             self._boot_complete_handlers.append(handler)
 
-    def hears(self, pattern: str | list, handler: Callable, event: str = "message") -> None:
+    def hears(
+        self,
+        pattern: str | re.Pattern | list | Callable,
+        handler: Callable,
+        event: str = "message",
+        regex: bool = False,
+    ) -> None:
         """
         Configures handler by looking for specific incoming word(s). You can add as many
         hears you want, but the bot will stop processing in the first pattern is matched.
 
         Args:
-            pattern (str|list): string or list of string to trigger specific handler. e.g: hello
+            pattern (str|re.Pattern|list|Callable): string, compiled regular expression, list of
+                them or callable receiving the message to trigger specific handler. e.g: hello
             handler (Callable): function to be called when pattern matches
             event (str): message type
+            regex (bool): treat pattern as regular expression(s) searched in the message text
+
+        Raises:
+            ValueError: if `regex` is set and pattern is not made of strings or compiled expressions
         """
-        bot_trigger = BotTrigger(type=None, pattern=pattern, handler=handler)
+        expressions = pattern if isinstance(pattern, list) else [pattern]
+
+        if regex and not all(isinstance(item, (str, re.Pattern)) for item in expressions):
+            raise ValueError("regex triggers only accept strings or compiled regular expressions")
+
+        bot_trigger = BotTrigger(type="regexp" if regex else None, pattern=pattern, handler=handler)
+
+        position = self._trigger_count
+        self._trigger_count += 1
 
-        if not event in self._triggers:
-            self._triggers[event] = []
+        if bot_trigger.matcher is not None:
+            self._pattern_triggers.setdefault(event, []).append((position, bot_trigger))
+            return
 
-        self._triggers[event].append(bot_trigger)
+        exact_triggers = self._exact_triggers.setdefault(event, {})
+
+        for text in [pattern] if isinstance(pattern, str) else pattern:
+            exact_triggers.setdefault(text, (position, bot_trigger))
 
     def on(self, event: str, handler: Callable):
 
@@ -225,15 +318,21 @@ class Bot:
         self._events[event].append(handler)
 
     async def spawn(
-        self, config: TurnContext | DialogContext = None, custom_adapter: BotAdapter = None
+        self,
+        config: TurnContext | DialogContext = None,
+        custom_adapter: BotAdapter = None,
+        reference: ConversationReference = None,
     ) -> BotWorker:
         """ """
         _config = dict()
 
         if isinstance(config, DialogContext):
+            if reference is None:
+                reference = TurnContext.get_conversation_reference(config.context.activity)
+
             _config = {
                 "dialog_context": config,
-                "reference": TurnContext.get_conversation_reference(config.context.activity),
+                "reference": reference,
                 "context": config.context,
                 "activity": config.context.activity,
             }
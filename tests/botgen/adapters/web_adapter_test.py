@@ -1,6 +1,11 @@
+import asyncio
+from types import SimpleNamespace
+
 import pytest
 from unittest.mock import AsyncMock, Mock
 from botgen.adapters import WebAdapter
+from botgen.adapters.web_adapter import _utcnow
+from botgen.core import BotMessage
 from botbuilder.schema import Activity, ConversationReference, ResourceResponse
 from botbuilder.core import TurnContext
 
@@ -14,7 +19,22 @@ def test_activity_to_message(web_adapter):
     assert message.type == activity.type
     assert message.text == activity.text
 
-@pytest.mark.asyncio
+def test_activity_to_message_copies_channel_data(web_adapter):
+    channel_data = BotMessage(type="message", text="Test message", user="user_id")
+    activity = Activity(type="message", text="Test message", channel_data=channel_data)
+    message = web_adapter.activity_to_message(activity)
+    assert message == channel_data
+    assert message is not channel_data
+
+    message.text = "Changed"
+    assert channel_data.text == "Test message"
+
+def test_activity_to_message_defaults_missing_channel_data(web_adapter):
+    channel_data = SimpleNamespace(user="user_id")
+    activity = Activity(type="message", text="Test message", channel_data=channel_data)
+    message = web_adapter.activity_to_message(activity)
+    assert message == BotMessage(type="message", text="Test message", user="user_id")
+
 async def test_send_activities_webhook(web_adapter):
     context = Mock()
     context.activity.channel_id = "websocket"
@@ -24,24 +44,145 @@ async def test_send_activities_webhook(web_adapter):
     with pytest.raises(NotImplementedError):
         await web_adapter.send_activities(context, activities)
 
-@pytest.mark.asyncio
+async def test_send_activities_without_activities(web_adapter):
+    context = Mock()
+    context.activity.channel_id = "websocket"
+    context.turn_state = {}
+
+    assert await web_adapter.send_activities(context, []) == []
+    assert context.turn_state == {}
+
+async def test_send_activities_http_body(web_adapter):
+    context = Mock()
+    context.activity.channel_id = "webhook"
+    context.turn_state = {}
+    activities = [
+        Activity(type="message", text="First message"),
+        Activity(type="message", text="Second message"),
+    ]
+
+    await web_adapter.send_activities(context, activities)
+
+    assert [m["text"] for m in context.turn_state["httpBody"]] == ["First message", "Second message"]
+
 async def test_update_activity(web_adapter):
     context = Mock()
     activity = Mock()
     with pytest.raises(NotImplementedError):
         await web_adapter.update_activity(context, activity)
 
-@pytest.mark.asyncio
 async def test_delete_activity(web_adapter):
     context = Mock()
     reference = Mock()
     with pytest.raises(NotImplementedError):
         await web_adapter.delete_activity(context, reference)
 
-@pytest.mark.asyncio
 async def test_process_activity(web_adapter):
     request = Mock()
     request.json = AsyncMock(return_value={"type": "message", "text": "Test message", "user": "user_id"})
     logic_callback = AsyncMock()
     response = await web_adapter.process_activity(request, logic_callback)
     assert response == None
+
+def test_utcnow_is_timezone_aware():
+    timestamp = _utcnow()
+    assert timestamp.tzinfo is not None
+    assert timestamp.utcoffset().total_seconds() == 0
+
+async def test_process_activity_deferred():
+    web_adapter = WebAdapter(defer_processing=True)
+    request = Mock()
+    request.json = AsyncMock(return_value={"type": "message", "text": "Test message", "user": "user_id"})
+
+    async def logic(context):
+        await context.send_activity("Reply message")
+
+    response = await web_adapter.process_activity(request, logic)
+    assert response["status"] == "accepted"
+
+    await asyncio.gather(*(task for _, task in web_adapter._deferred.values()))
+
+    result = web_adapter.get_deferred_response(response["token"])
+    assert result["status"] == "done"
+    assert result["body"][0]["text"] == "Reply message"
+    assert web_adapter.get_deferred_response(response["token"])["status"] == "unknown"
+
+async def test_evict_deferred_keeps_expired_turns_running():
+    web_adapter = WebAdapter(defer_processing=True, deferred_ttl=0)
+    request = Mock()
+    request.json = AsyncMock(return_value={"type": "message", "text": "Test message", "user": "user_id"})
+    blocker = asyncio.Event()
+
+    async def logic(context):
+        await blocker.wait()
+
+    first = await web_adapter.process_activity(request, logic)
+    _, first_task = web_adapter._deferred[first["token"]]
+    second = await web_adapter.process_activity(request, logic)
+    await asyncio.sleep(0)
+
+    assert not first_task.done()
+    assert first_task in web_adapter._running_deferred
+    assert list(web_adapter._deferred) == [second["token"]]
+
+    blocker.set()
+    await asyncio.gather(*web_adapter._running_deferred)
+    assert not web_adapter._running_deferred
+
+async def test_evict_deferred_drops_finished_turns():
+    web_adapter = WebAdapter(defer_processing=True, max_deferred=1)
+    request = Mock()
+    request.json = AsyncMock(return_value={"type": "message", "text": "Test message", "user": "user_id"})
+    logic = AsyncMock()
+
+    await web_adapter.process_activity(request, logic)
+    await asyncio.gather(*(task for _, task in web_adapter._deferred.values()))
+    second = await web_adapter.process_activity(request, logic)
+
+    assert second["status"] == "accepted"
+    assert list(web_adapter._deferred) == [second["token"]]
+    await asyncio.sleep(0)
+
+async def test_process_activity_deferred_at_capacity_runs_inline():
+    web_adapter = WebAdapter(defer_processing=True, max_deferred=1)
+    request = Mock()
+    request.json = AsyncMock(return_value={"type": "message", "text": "Test message", "user": "user_id"})
+    first_started = asyncio.Event()
+
+    async def logic(context):
+        if not first_started.is_set():
+            first_started.set()
+            await asyncio.Event().wait()
+        await context.send_activity("Reply message")
+
+    first = await web_adapter.process_activity(request, logic)
+    await asyncio.sleep(0)
+    second = await web_adapter.process_activity(request, logic)
+
+    assert second["status"] == "done"
+    assert second["body"][0]["text"] == "Reply message"
+    assert web_adapter.get_deferred_response(first["token"])["status"] == "pending"
+    web_adapter._deferred[first["token"]][1].cancel()
+
+async def test_get_deferred_response_cancelled():
+    web_adapter = WebAdapter(defer_processing=True)
+    task = asyncio.create_task(asyncio.Event().wait())
+    web_adapter._deferred["token"] = (0, task)
+    task.cancel()
+    await asyncio.sleep(0)
+
+    assert web_adapter.get_deferred_response("token") == {"status": "error", "token": "token"}
+
+async def test_get_deferred_response_failed():
+    web_adapter = WebAdapter(defer_processing=True)
+    request = Mock()
+    request.json = AsyncMock(return_value={"type": "message", "text": "Test message", "user": "user_id"})
+    logic = AsyncMock(side_effect=RuntimeError("boom"))
+
+    response = await web_adapter.process_activity(request, logic)
+    await asyncio.gather(*(task for _, task in web_adapter._deferred.values()), return_exceptions=True)
+
+    assert web_adapter.get_deferred_response(response["token"]) == {
+        "status": "error",
+        "token": response["token"],
+    }
@@ -1,9 +1,13 @@
 import pytest
+from enum import Enum
 from unittest.mock import Mock, AsyncMock
 from botgen.bot_worker import BotWorker
+from botgen.core import BotMessage
 from botbuilder.schema import Activity
 from botbuilder.core import TurnContext
 
+_REPLY_ACTIVITY = Activity(type="message", text="Reply message", channel_data={})
+
 @pytest.fixture
 def bot_worker():
     # Mock Bot and config
@@ -19,7 +23,6 @@ def test_get_config(bot_worker):
     config = bot_worker.get_config()
     assert config == bot_worker._config
 
-@pytest.mark.asyncio
 async def test_say(bot_worker):
     # Mock the context's send_activity method
     bot_worker._config["context"].send_activity = AsyncMock()
@@ -29,16 +32,18 @@ async def test_say(bot_worker):
 
     bot_worker._config["context"].send_activity.assert_called_once()
 
-@pytest.mark.asyncio
-async def test_reply(bot_worker):
+async def test_reply(bot_worker, monkeypatch):
     # Mock methods and objects needed for reply
-    activity = Activity(type="message", text="Reply message", channel_data={})
-    bot_worker.ensure_message_format = AsyncMock(return_value=activity)
-    TurnContext.get_conversation_reference = Mock(return_value={"conversation": {"id": "123"}})
-    TurnContext.apply_conversation_reference = Mock(return_value=activity)
-    bot_worker.say = AsyncMock()
+    activity = _REPLY_ACTIVITY
+    monkeypatch.setattr(BotWorker, "ensure_message_format", Mock(return_value=activity))
+    monkeypatch.setattr(
+        TurnContext, "get_conversation_reference", Mock(return_value={"conversation": {"id": "123"}})
+    )
+    monkeypatch.setattr(TurnContext, "apply_conversation_reference", Mock(return_value=activity))
+    monkeypatch.setattr(BotWorker, "say", AsyncMock())
 
     message_src = Mock()
+    message_src.reference = None
     message_src.incoming_message = Mock()
     message_resp = "Replying to the message"
 
@@ -49,22 +54,53 @@ async def test_reply(bot_worker):
     TurnContext.apply_conversation_reference.assert_called_once_with(activity, {"conversation": {"id": "123"}})
     bot_worker.say.assert_called_once_with(activity)
 
-@pytest.mark.asyncio
-async def test_ensure_message_format_string(bot_worker):
+async def test_reply_reuses_message_reference(bot_worker, monkeypatch):
+    activity = _REPLY_ACTIVITY
+    reference = {"conversation": {"id": "123"}}
+    monkeypatch.setattr(TurnContext, "get_conversation_reference", Mock())
+    monkeypatch.setattr(TurnContext, "apply_conversation_reference", Mock(return_value=activity))
+    monkeypatch.setattr(BotWorker, "say", AsyncMock())
+
+    message_src = Mock()
+    message_src.reference = reference
+
+    await bot_worker.reply(message_src, "Replying to the message")
+
+    TurnContext.get_conversation_reference.assert_not_called()
+    TurnContext.apply_conversation_reference.assert_called_once()
+    assert TurnContext.apply_conversation_reference.call_args.args[1] == reference
+
+def test_ensure_message_format_string(bot_worker):
     message = "Test message"
-    activity = await bot_worker.ensure_message_format(message)
+    activity = bot_worker.ensure_message_format(message)
     assert isinstance(activity, Activity)
     assert activity.type == "message"
     assert activity.text == message
 
-@pytest.mark.asyncio
-async def test_ensure_message_format_message_object(bot_worker):
+def test_ensure_message_format_string_subclass(bot_worker):
+    class Replies(str, Enum):
+        HELLO = "hello"
+
+    activity = bot_worker.ensure_message_format(Replies.HELLO)
+    assert isinstance(activity, Activity)
+    assert activity.type == "message"
+    assert activity.text == "hello"
+
+def test_ensure_message_format_message_object(bot_worker):
     message = Mock()
     message.__dict__ = {"type": "test", "text": "Test message"}
-    activity = await bot_worker.ensure_message_format(message)
+    activity = bot_worker.ensure_message_format(message)
+    assert isinstance(activity, Activity)
+    assert activity.type == message.type
+    assert activity.text == message.text
+
+def test_ensure_message_format_bot_message(bot_worker, caplog):
+    message = BotMessage(type="message", text="Test message", user="user_id")
+    activity = bot_worker.ensure_message_format(message)
     assert isinstance(activity, Activity)
     assert activity.type == message.type
     assert activity.text == message.text
+    assert "not a known attribute" not in caplog.text
 
 if __name__ == '__main__':
     pytest.main()
@@ -3,9 +3,13 @@ from botgen.conversation_state import BotConversationState
 from botbuilder.core import MemoryStorage
 from unittest.mock import Mock
 
+@pytest.fixture(scope="session")
+def memory_storage():
+    return MemoryStorage()
+
 @pytest.fixture
-def conversation_state():
-    return BotConversationState(MemoryStorage())
+def conversation_state(memory_storage):
+    return BotConversationState(memory_storage)
 
 def test_get_storage_key(conversation_state):
     # Mocking the necessary attributes of TurnContext
@@ -19,22 +23,12 @@ def test_get_storage_key(conversation_state):
     actual_key = conversation_state.get_storage_key(turn_context_mock)
     assert actual_key == expected_key
 
-def test_get_storage_key_missing_conversation(conversation_state):
-    # Mocking the necessary attributes of TurnContext
-    activity_mock = Mock()
-    activity_mock.channel_id = "test_channel"
-    activity_mock.conversation = None  # Simulating missing conversation
-    turn_context_mock = Mock()
-    turn_context_mock.activity = activity_mock
-
-    with pytest.raises(Exception):
-        conversation_state.get_storage_key(turn_context_mock)
-
-def test_get_storage_key_missing_conversation_id(conversation_state):
-    # Mocking the necessary attributes of TurnContext
+@pytest.mark.parametrize("conversation", [None, {"id": None}])
+def test_get_storage_key_missing_conversation(conversation_state, conversation):
+    # Mocking the necessary attributes of TurnContext, without a conversation id
     activity_mock = Mock()
     activity_mock.channel_id = "test_channel"
-    activity_mock.conversation = {"id": None}  # Simulating missing conversation id
+    activity_mock.conversation = conversation
     turn_context_mock = Mock()
     turn_context_mock.activity = activity_mock
 
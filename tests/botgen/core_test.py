@@ -1,5 +1,6 @@
+import re
+from dataclasses import replace
 from unittest.mock import AsyncMock
-from unittest.mock import MagicMock
 from unittest.mock import Mock
 
 import pytest
@@ -14,6 +15,15 @@ from botgen import Bot
 from botgen.bot_worker import BotWorker
 from botgen.core import BotMessage
 
+_EXPECTED_BOT_MESSAGE = BotMessage(
+    type="message",
+    user="user_id",
+    text="Test message",
+    channel="channel_id",
+    value="message_value",
+    reference={"reference": "conversation_reference"},
+)
+
 
 @pytest.fixture
 def bot():
@@ -27,7 +37,7 @@ def mock_request():
 
 @pytest.fixture
 def mock_turn_context():
-    return MagicMock(spec=TurnContext)
+    return Mock(turn_state={})
 
 
 @pytest.fixture
@@ -37,12 +47,7 @@ def mock_bot_worker():
 
 @pytest.fixture
 def mock_bot_message():
-    return Mock(spec=BotMessage)
-
-
-@pytest.fixture
-def mock_trigger():
-    return Mock()
+    return BotMessage(type="message", text="")
 
 
 @pytest.fixture
@@ -72,12 +77,6 @@ def test_bot_initialization(bot):
     assert isinstance(bot.dialog_set, DialogSet)
 
 
-def test_configure_webhook(bot):
-    bot.webserver = Mock()
-    bot.configure_webhook()
-
-
-@pytest.mark.asyncio
 async def test_process_incoming_message(bot, mock_request):
     bot.adapter = Mock()
     bot.handle_turn = Mock()
@@ -100,8 +99,28 @@ def test_configure_webhook(bot):
     )
 
 
-@pytest.mark.asyncio
-async def test_handle_turn(bot, mock_turn_context):
+def test_configure_webhook_with_deferred_adapter():
+    adapter = Mock(defer_processing=True)
+    bot = Bot(adapter=adapter)
+
+    routes = {(route.method, route.resource.canonical) for route in bot.webserver.router.routes()}
+
+    assert ("POST", "/api/messages") in routes
+    assert ("GET", "/api/messages/{token}") in routes
+
+
+async def test_process_deferred_response(bot, mock_request):
+    bot.adapter = Mock()
+    bot.adapter.get_deferred_response = Mock(return_value={"status": "pending", "token": "abc"})
+    mock_request.match_info = {"token": "abc"}
+
+    response = await bot.process_deferred_response(mock_request)
+
+    bot.adapter.get_deferred_response.assert_called_once_with("abc")
+    assert response.status == 200
+
+
+async def test_handle_turn(bot, mock_turn_context, monkeypatch):
     # Set up the mocked TurnContext
     activity = Mock()
     activity.type = "message"
@@ -109,21 +128,15 @@ async def test_handle_turn(bot, mock_turn_context):
     activity.text = "Test message"
     activity.conversation = {"id": "channel_id"}
     activity.value = "message_value"
-    TurnContext.get_conversation_reference = Mock(
-        return_value={"reference": "conversation_reference"}
+    monkeypatch.setattr(
+        TurnContext,
+        "get_conversation_reference",
+        Mock(return_value={"reference": "conversation_reference"}),
     )
     mock_turn_context.activity = activity
 
     # Set up expectations for BotMessage creation
-    expected_bot_message = BotMessage(
-        type="message",
-        user="user_id",
-        text="Test message",
-        channel="channel_id",
-        value="message_value",
-        reference={"reference": "conversation_reference"},
-        incoming_message=activity,
-    )
+    expected_bot_message = replace(_EXPECTED_BOT_MESSAGE, incoming_message=activity)
 
     # Mock the dialog set and create_context method
     dialog_context_mock = Mock()
@@ -139,22 +152,35 @@ async def test_handle_turn(bot, mock_turn_context):
     await bot.handle_turn(mock_turn_context)
 
     # Assertions
+    assert mock_turn_context.turn_state["BotMessage"] == expected_bot_message
     bot.dialog_set.create_context.assert_called_once_with(turn_context=mock_turn_context)
-    bot.spawn.assert_called_once_with(dialog_context_mock)
+    bot.spawn.assert_called_once_with(
+        dialog_context_mock, reference={"reference": "conversation_reference"}
+    )
     bot._process_trigger_and_events.assert_called_once_with(
         bot_worker=bot.spawn.return_value, message=expected_bot_message
     )
 
 
-@pytest.mark.asyncio
-async def test_process_trigger_and_events_with_listen_results(
-    bot, mock_bot_worker, mock_bot_message
+@pytest.mark.parametrize(
+    "listen_results,trigger_results,expected,trigger_called",
+    [
+        (["listen_result"], None, ["listen_result"], False),
+        (None, ["trigger_result"], ["trigger_result"], True),
+    ],
+)
+async def test_process_trigger_and_events(
+    bot,
+    mock_bot_worker,
+    mock_bot_message,
+    listen_results,
+    trigger_results,
+    expected,
+    trigger_called,
 ):
-    # Mock _listen_for_triggers method to return some results
-    bot._listen_for_triggers = AsyncMock(return_value=["listen_result"])
-
-    # Mock trigger method
-    bot.trigger = AsyncMock()
+    # Mock _listen_for_triggers and trigger methods
+    bot._listen_for_triggers = AsyncMock(return_value=listen_results)
+    bot.trigger = AsyncMock(return_value=trigger_results)
 
     # Call the _process_trigger_and_events method
     result = await bot._process_trigger_and_events(
@@ -162,37 +188,20 @@ async def test_process_trigger_and_events_with_listen_results(
     )
 
     # Assertions
-    assert result == ["listen_result"]
+    assert result == expected
     bot._listen_for_triggers.assert_called_once_with(
         bot_worker=mock_bot_worker, message=mock_bot_message
     )
-    bot.trigger.assert_not_called()  # Since listen_results is not empty, trigger should not be called
-
 
-@pytest.mark.asyncio
-async def test_process_trigger_and_events_with_trigger_results(
-    bot, mock_bot_worker, mock_bot_message
-):
-    # Mock _listen_for_triggers method to return None
-    bot._listen_for_triggers = AsyncMock(return_value=None)
+    # trigger only runs when no hears() trigger handled the message
+    if trigger_called:
+        bot.trigger.assert_called_once_with(
+            mock_bot_message.type, mock_bot_worker, mock_bot_message
+        )
+    else:
+        bot.trigger.assert_not_called()
 
-    # Mock trigger method to return some results
-    bot.trigger = AsyncMock(return_value=["trigger_result"])
 
-    # Call the _process_trigger_and_events method
-    result = await bot._process_trigger_and_events(
-        bot_worker=mock_bot_worker, message=mock_bot_message
-    )
-
-    # Assertions
-    assert result == ["trigger_result"]
-    bot._listen_for_triggers.assert_called_once_with(
-        bot_worker=mock_bot_worker, message=mock_bot_message
-    )
-    bot.trigger.assert_called_once_with(mock_bot_message.type, mock_bot_worker, mock_bot_message)
-
-
-@pytest.mark.asyncio
 async def test_trigger_with_registered_event_handler(bot, mock_bot_worker, mock_bot_message):
     # Register some event handlers
     mock_event_handler = AsyncMock()
@@ -205,7 +214,6 @@ async def test_trigger_with_registered_event_handler(bot, mock_bot_worker, mock_
     mock_event_handler.assert_called_once_with(mock_bot_worker, mock_bot_message)
 
 
-@pytest.mark.asyncio
 async def test_trigger_with_unregistered_event_handler(bot, mock_bot_worker, mock_bot_message):
     # Call the trigger method with an event that doesn't have any registered handler
     await bot.trigger("unregistered_event", mock_bot_worker, mock_bot_message)
@@ -214,13 +222,10 @@ async def test_trigger_with_unregistered_event_handler(bot, mock_bot_worker, moc
     assert not mock_bot_worker.called
 
 
-@pytest.mark.asyncio
 async def test_listen_for_triggers_with_matching_trigger(bot, mock_bot_worker, mock_bot_message):
-    # Mock a trigger and its handler
-    mock_trigger = Mock()
-    mock_trigger.pattern = "hello"
-    mock_trigger.handler = AsyncMock(return_value="trigger_results")
-    bot._triggers = {"message": [mock_trigger]}
+    # Register a trigger and its handler
+    handler = AsyncMock(return_value="trigger_results")
+    bot.hears("hello", handler)
     mock_bot_message.type = "message"
     mock_bot_message.text = "hello"
 
@@ -229,10 +234,25 @@ async def test_listen_for_triggers_with_matching_trigger(bot, mock_bot_worker, m
 
     # Assertions
     assert result == "trigger_results"
-    mock_trigger.handler.assert_called_once_with(mock_bot_worker, mock_bot_message)
+    handler.assert_called_once_with(mock_bot_worker, mock_bot_message)
+
+
+async def test_listen_for_triggers_keeps_registration_order(bot, mock_bot_worker, mock_bot_message):
+    # A callable pattern registered first wins over a later exact match
+    first_handler = AsyncMock(return_value="first")
+    second_handler = AsyncMock(return_value="second")
+    bot.hears(AsyncMock(return_value=True), first_handler)
+    bot.hears(["hello", "hi"], second_handler)
+    mock_bot_message.type = "message"
+    mock_bot_message.text = "hi"
+
+    result = await bot._listen_for_triggers(mock_bot_worker, mock_bot_message)
+
+    # Assertions
+    assert result == "first"
+    second_handler.assert_not_called()
 
 
-@pytest.mark.asyncio
 async def test_listen_for_triggers_with_no_matching_trigger(bot, mock_bot_worker, mock_bot_message):
     # Call the _listen_for_triggers method with a message of type "unregistered_type"
     result = await bot._listen_for_triggers(mock_bot_worker, mock_bot_message)
@@ -241,68 +261,91 @@ async def test_listen_for_triggers_with_no_matching_trigger(bot, mock_bot_worker
     assert result == False  # No trigger matched, so the result should be False
 
 
-@pytest.mark.asyncio
-async def test_test_trigger_with_string_pattern(bot, mock_trigger, mock_bot_message):
-    # Set up the trigger with a string pattern
-    mock_trigger.pattern = "test_pattern"
-
-    # Call the _test_trigger method with a message that matches the pattern
-    mock_bot_message.text = "test_pattern"
-    result = await bot._test_trigger(mock_trigger, mock_bot_message)
-
-    # Assertions
-    assert result == True
+async def test_listen_for_triggers_with_unhashable_text(bot, mock_bot_worker, mock_bot_message):
+    handler = AsyncMock(return_value="trigger_results")
+    bot.hears("hello", handler)
+    bot.hears([{"text": "bye"}, "bye"], AsyncMock(return_value=False))
+    mock_bot_message.type = "message"
+    mock_bot_message.text = {"text": "hello"}
 
-    # Call the _test_trigger method with a message that does not match the pattern
-    mock_bot_message.text = "different_pattern"
-    result = await bot._test_trigger(mock_trigger, mock_bot_message)
+    result = await bot._listen_for_triggers(mock_bot_worker, mock_bot_message)
 
-    # Assertions
     assert result == False
+    handler.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    "trigger_type,pattern,text,expected",
+    [
+        (None, "test_pattern", "test_pattern", True),
+        (None, "test_pattern", "different_pattern", False),
+        (None, ["pattern1", "pattern2"], "pattern1", True),
+        (None, ["pattern1", "pattern2"], "pattern3", False),
+        (None, ["pattern1", "pattern2"], {"text": "pattern1"}, False),
+        (None, [{"text": "pattern1"}, "pattern2"], {"text": "pattern1"}, True),
+        (None, AsyncMock(return_value=True), "anything", True),
+        (None, None, "anything", False),
+        ("regexp", [r"^hel+o", r"bye$"], "helllo there", True),
+        ("regexp", [r"^hel+o", r"bye$"], "see you, bye", True),
+        ("regexp", [r"^hel+o", r"bye$"], "say hello", False),
+        ("regexp", [r"^hel+o", r"bye$"], None, False),
+        ("regexp", r"order \d+", 42, False),
+        ("regexp", [r"(?i)hello", r"(?i)bye"], "BYE now", True),
+        ("regexp", [r"(a)\1", r"(b)\1"], "bb", True),
+        ("regexp", [re.compile(r"^hel+o"), re.compile(r"bye$")], "see you, bye", True),
+        (None, re.compile(r"order \d+"), "order 42", True),
+        (None, [re.compile(r"order \d+")], "order 42", True),
+        (None, [re.compile(r"order \d+"), "hi"], "hi", True),
+        (None, [re.compile(r"order \d+"), "hi"], "hi there", False),
+        (None, [re.compile(r"order \d+"), "hi"], 42, False),
+    ],
+)
+async def test_listen_for_triggers_with_pattern(
+    bot, mock_bot_worker, mock_bot_message, trigger_type, pattern, text, expected
+):
+    # Register the trigger and set the incoming message text
+    handler = AsyncMock(return_value="trigger_results")
+    bot.hears(pattern, handler, regex=trigger_type == "regexp")
+    mock_bot_message.type = "message"
+    mock_bot_message.text = text
 
+    result = await bot._listen_for_triggers(mock_bot_worker, mock_bot_message)
 
-@pytest.mark.asyncio
-async def test_test_trigger_with_list_pattern(bot, mock_trigger, mock_bot_message):
-    # Set up the trigger with a list pattern
-    mock_trigger.pattern = ["pattern1", "pattern2"]
+    # Assertions
+    assert (result == "trigger_results") == expected
+    assert handler.called == expected
 
-    # Call the _test_trigger method with a message that matches one of the patterns
-    mock_bot_message.text = "pattern1"
-    result = await bot._test_trigger(mock_trigger, mock_bot_message)
 
-    # Assertions
-    assert result == True
+async def test_listen_for_triggers_with_sync_and_async_patterns(
+    bot, mock_bot_worker, mock_bot_message
+):
+    handler = AsyncMock(return_value="trigger_results")
+    bot.hears(lambda message: False, AsyncMock())
+    bot.hears(AsyncMock(return_value=True), handler)
+    mock_bot_message.type = "message"
 
-    # Call the _test_trigger method with a message that does not match any pattern
-    mock_bot_message.text = "pattern3"
-    result = await bot._test_trigger(mock_trigger, mock_bot_message)
+    result = await bot._listen_for_triggers(mock_bot_worker, mock_bot_message)
 
-    # Assertions
-    assert result == False
+    assert result == "trigger_results"
+    handler.assert_called_once_with(mock_bot_worker, mock_bot_message)
 
 
-@pytest.mark.asyncio
-async def test_test_trigger_with_callable_pattern(bot, mock_trigger, mock_bot_message):
-    # Set up the trigger with a callable pattern
-    mock_trigger.pattern = AsyncMock(return_value=True)
+def test_ready_defers_handler_until_booted(bot):
+    handler = Mock()
 
-    # Call the _test_trigger method with any message (the pattern will always return True)
-    result = await bot._test_trigger(mock_trigger, mock_bot_message)
+    bot.ready(handler)
 
-    # Assertions
-    assert result == True
+    handler.assert_not_called()
+    assert bot._boot_complete_handlers == [handler]
 
 
-@pytest.mark.asyncio
-async def test_test_trigger_with_invalid_pattern(bot, mock_trigger, mock_bot_message):
-    # Set up the trigger with an invalid pattern (None in this case)
-    mock_trigger.pattern = None
+def test_ready_calls_handler_when_booted(bot):
+    handler = Mock()
+    bot.booted = True
 
-    # Call the _test_trigger method with any message
-    result = await bot._test_trigger(mock_trigger, mock_bot_message)
+    bot.ready(handler)
 
-    # Assertions
-    assert result == False
+    handler.assert_called_once_with(bot)
 
 
 def test_hears_adds_trigger(bot):
@@ -313,10 +356,31 @@ def test_hears_adds_trigger(bot):
     # Call the hears method
     bot.hears(pattern, handler)
 
-    # Assert that the trigger is added to the list of triggers for the "message" event
-    assert len(bot._triggers["message"]) == 1
-    assert bot._triggers["message"][0].pattern == pattern
-    assert bot._triggers["message"][0].handler == handler
+    # Assert that the trigger is indexed by its text for the "message" event
+    _, trigger = bot._exact_triggers["message"][pattern]
+    assert trigger.pattern == pattern
+    assert trigger.handler == handler
+    assert "message" not in bot._pattern_triggers
+
+
+async def test_hears_with_regex(bot, mock_bot_worker, mock_bot_message):
+    handler = AsyncMock(return_value="trigger_results")
+    bot.hears(r"order \d+", handler, regex=True)
+    mock_bot_message.type = "message"
+    mock_bot_message.text = "where is order 42?"
+
+    result = await bot._listen_for_triggers(mock_bot_worker, mock_bot_message)
+
+    assert result == "trigger_results"
+    assert bot._pattern_triggers["message"][0][1].type == "regexp"
+    assert "message" not in bot._exact_triggers
+
+
+def test_hears_with_regex_rejects_callable(bot):
+    with pytest.raises(ValueError):
+        bot.hears(lambda message: True, Mock(), regex=True)
+
+    assert "message" not in bot._pattern_triggers
 
 
 def test_on_adds_event_handler(bot):
@@ -331,7 +395,6 @@ def test_on_adds_event_handler(bot):
     assert bot._events[event][0] == handler
 
 
-@pytest.mark.asyncio
 async def test_spawn_with_dialog_context(bot, mock_dialog_context):
     # Mock DialogContext configuration
     mock_dialog_context.context.activity = Mock()
@@ -345,3 +408,17 @@ async def test_spawn_with_dialog_context(bot, mock_dialog_context):
     assert bot_worker._controller == bot
     assert bot_worker._config["context"] == mock_dialog_context.context
     assert bot_worker._config["activity"] == mock_dialog_context.context.activity
+
+
+async def test_spawn_with_reference(bot, mock_dialog_context, monkeypatch):
+    # Mock DialogContext configuration
+    mock_dialog_context.context.activity = Mock()
+    get_conversation_reference = Mock()
+    monkeypatch.setattr(TurnContext, "get_conversation_reference", get_conversation_reference)
+
+    # Call the spawn method with an already computed reference
+    bot_worker = await bot.spawn(config=mock_dialog_context, reference="reference")
+
+    # Assertions
+    assert bot_worker._config["reference"] == "reference"
+    get_conversation_reference.assert_not_called()